@@ -1,16 +1,36 @@
 import sys
 import os
-import zlib
 import hashlib
 import time
 import urllib.request
 import struct
+import re
+import queue
+import threading
+import collections
+import mmap
+import tempfile
+import concurrent.futures
+
+# ISA-L's zlib is a faster drop-in for the stdlib module when installed
+try:
+    from isal import isal_zlib as zlib
+except ImportError:
+    import zlib
+
+
+# Two-digit hex names of the 256 object shard directories
+_SHARDS = [f"{i:02x}" for i in range(256)]
+
+
+def object_path(sha):
+    """Loose object path for a raw 20-byte SHA."""
+    return f".git/objects/{_SHARDS[sha[0]]}/{sha[1:].hex()}"
 
 
 def read_object(sha):
-    """Read and decompress a Git object."""
-    path = f".git/objects/{sha[:2]}/{sha[2:]}"
-    with open(path, "rb") as f:
+    """Read and decompress a Git object by its raw SHA."""
+    with open(object_path(sha), "rb") as f:
         compressed = f.read()
     decompressed = zlib.decompress(compressed)
     null_idx = decompressed.find(b"\x00")
@@ -20,50 +40,115 @@ def read_object(sha):
     return obj_type, content
 
 
+# Object shard directories already known to exist
+_created_shards = set()
+
+# Objects written (or found on disk) by this process
+_written_objects = set()
+
+
+def ensure_shard(prefix):
+    """Create .git/objects/<prefix> once per process."""
+    if prefix not in _created_shards:
+        os.makedirs(f".git/objects/{prefix}", exist_ok=True)
+        _created_shards.add(prefix)
+
+
+def write_object(sha, header, content):
+    """Compress header and content into a loose object file."""
+    # Objects are content-addressed and only ever linked into place once
+    # fully written, so an existing file is complete and identical and
+    # there is nothing to compress
+    if sha in _written_objects:
+        return
+    ensure_shard(_SHARDS[sha[0]])
+    path = object_path(sha)
+    if os.path.exists(path):
+        _written_objects.add(sha)
+        return
+
+    # Level 1 matches Git's default for loose objects
+    compressor = zlib.compressobj(1)
+    data = compressor.compress(header) + compressor.compress(content) + compressor.flush()
+
+    # Write to a temp file and link it into place, as Git does, so a
+    # write that stops partway never leaves a truncated object behind
+    fd, tmp_path = tempfile.mkstemp(prefix="tmp_obj_", dir=os.path.dirname(path))
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fchmod(fd, 0o444)
+        finally:
+            os.close(fd)
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            # Lost a race with another writer of the same object
+            pass
+        except OSError:
+            # No hard links on this filesystem; fall back to a rename,
+            # which is safe since any racing writer has identical bytes
+            os.replace(tmp_path, path)
+            tmp_path = None
+    finally:
+        if tmp_path is not None:
+            os.unlink(tmp_path)
+    _written_objects.add(sha)
+
+
+# Each tree entry is "<mode> <name>\0" followed by a fixed 20-byte SHA
+TREE_ENTRY = re.compile(rb"([0-9]{5,6}) ([^\x00]+)\x00(.{20})", re.DOTALL)
+
+
+def parse_tree(tree_content):
+    """Split raw tree content into (mode, name, sha) entries."""
+    # One C-level scan over the whole tree instead of two finds per entry
+    return TREE_ENTRY.findall(tree_content)
+
+
+# Permission bits for each blob mode found in a tree
+FILE_PERMISSIONS = {
+    b"100644": 0o644,
+    b"100755": 0o755,
+}
+
+
+def write_file(path, content, permissions):
+    """Write content to a new working-tree file created with permissions."""
+    # A raw fd skips Python's buffered writer, and creating the file with
+    # its final mode saves a separate chmod
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, permissions)
+    try:
+        view = memoryview(content)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 def checkout_tree(tree_sha, path="."):
     """Recursively checkout a tree object."""
     _, tree_content = read_object(tree_sha)
     
-    i = 0
-    while i < len(tree_content):
-        # Find space after mode
-        space_idx = tree_content.find(b" ", i)
-        mode = tree_content[i:space_idx]
-        
-        # Find null after name
-        null_idx = tree_content.find(b"\x00", space_idx)
-        name = tree_content[space_idx + 1:null_idx].decode()
-        
-        # Read SHA (20 bytes)
-        sha = tree_content[null_idx + 1:null_idx + 21]
-        sha_hex = sha.hex()
-        
-        # Move to next entry
-        i = null_idx + 21
-        
+    for mode, name, sha in parse_tree(tree_content):
         # Create path
-        full_path = os.path.join(path, name)
+        full_path = os.path.join(path, name.decode())
         
         if mode == b"40000":
             # Directory
             os.makedirs(full_path, exist_ok=True)
-            checkout_tree(sha_hex, full_path)
+            checkout_tree(sha, full_path)
         else:
             # File
-            _, content = read_object(sha_hex)
-            with open(full_path, "wb") as f:
-                f.write(content)
-            
-            # Set executable permission if needed
-            if mode == b"100755":
-                os.chmod(full_path, 0o755)
-            else:
-                os.chmod(full_path, 0o644)
+            _, content = read_object(sha)
+            write_file(full_path, content, FILE_PERMISSIONS.get(mode, 0o644))
 
 
 def checkout_commit(commit_sha):
     """Checkout a commit by extracting its tree."""
-    _, commit_content = read_object(commit_sha)
+    _, commit_content = read_object(bytes.fromhex(commit_sha))
     
     # Parse commit to find tree SHA
     lines = commit_content.decode().split('\n')
@@ -78,10 +163,55 @@ def checkout_commit(commit_sha):
         raise ValueError("Could not find tree in commit")
     
     # Checkout the tree
-    checkout_tree(tree_sha)
+    checkout_tree(bytes.fromhex(tree_sha))
 
 
-def write_tree(directory="."):
+def available_cpus():
+    """Number of CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# Below this many files the process pool costs more than it saves
+PARALLEL_BLOB_THRESHOLD = 64
+
+
+# Files at least this large are mapped instead of read into memory
+MMAP_THRESHOLD = 64 * 1024
+
+
+def hash_and_write_blob(path):
+    """Store a file as a blob object and return its raw SHA."""
+    size = os.stat(path).st_size
+    if size < MMAP_THRESHOLD:
+        with open(path, "rb") as f:
+            return store_blob(f.read())
+
+    # Hash and compress straight out of the page cache
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        with mmap.mmap(fd, size, prot=mmap.PROT_READ) as mm:
+            with memoryview(mm) as content:
+                return store_blob(content)
+    finally:
+        os.close(fd)
+
+
+def store_blob(content):
+    """Write content as a blob object and return its raw SHA."""
+    blob_header = b"blob %d\x00" % len(content)
+    h = hashlib.sha1()
+    h.update(blob_header)
+    h.update(content)
+    sha = h.digest()
+
+    write_object(sha, blob_header, content)
+    return sha
+
+
+def scan_tree(directory, file_paths):
+    """Collect sorted (mode, name, path, children) entries for a directory."""
     entries = []
     with os.scandir(directory) as it:
         sorted_entries = sorted(it, key=lambda e: e.name)
@@ -90,60 +220,74 @@ def write_tree(directory="."):
                 continue
 
             if entry.is_dir():
-                mode = b"40000"
-                sha = bytes.fromhex(write_tree(entry.path))
-                entries.append((mode, entry.name.encode(), sha))
+                children = scan_tree(entry.path, file_paths)
+                entries.append((b"40000", entry.name.encode(), entry.path, children))
             else:
                 if os.stat(entry.path).st_mode & 0o111:
                     mode = b"100755"
                 else:
                     mode = b"100644"
+                file_paths.append(entry.path)
+                entries.append((mode, entry.name.encode(), entry.path, None))
+    return entries
 
-                with open(entry.path, "rb") as f:
-                    content = f.read()
-
-                blob_object = b"blob %d\x00%s" % (len(content), content)
-                hex_sha = hashlib.sha1(blob_object).hexdigest()
 
-                object_dir = f".git/objects/{hex_sha[:2]}"
-                os.makedirs(object_dir, exist_ok=True)
-                object_path = f"{object_dir}/{hex_sha[2:]}"
-                with open(object_path, "wb") as f:
-                    f.write(zlib.compress(blob_object))
-
-                sha = bytes.fromhex(hex_sha)
-                entries.append((mode, entry.name.encode(), sha))
+def write_tree_object(entries, blob_shas):
+    """Write the tree object for scanned entries and return its raw SHA."""
+    tree_entries = []
+    for mode, name, path, children in entries:
+        if children is None:
+            sha = blob_shas[path]
+        else:
+            sha = write_tree_object(children, blob_shas)
+        tree_entries.append((mode, name, sha))
 
     tree_content = b"".join(
-        mode + b" " + name + b"\x00" + sha for mode, name, sha in entries
+        mode + b" " + name + b"\x00" + sha for mode, name, sha in tree_entries
     )
 
     tree_header = b"tree %d\x00" % len(tree_content)
-    tree_object = tree_header + tree_content
+    h = hashlib.sha1()
+    h.update(tree_header)
+    h.update(tree_content)
+    sha = h.digest()
+    write_object(sha, tree_header, tree_content)
 
-    tree_hex_sha = hashlib.sha1(tree_object).hexdigest()
+    return sha
 
-    object_dir = f".git/objects/{tree_hex_sha[:2]}"
-    os.makedirs(object_dir, exist_ok=True)
-    object_path = f"{object_dir}/{tree_hex_sha[2:]}"
-    with open(object_path, "wb") as f:
-        f.write(zlib.compress(tree_object))
 
-    return tree_hex_sha
+def write_tree(directory="."):
+    # Walk the directory first, then hash and compress every blob in
+    # parallel; each file is independent, only the trees need ordering
+    file_paths = []
+    entries = scan_tree(directory, file_paths)
+
+    workers = available_cpus()
+    if workers > 1 and len(file_paths) >= PARALLEL_BLOB_THRESHOLD:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            shas = list(pool.map(hash_and_write_blob, file_paths, chunksize=32))
+    else:
+        shas = [hash_and_write_blob(path) for path in file_paths]
+
+    blob_shas = dict(zip(file_paths, shas))
+    return write_tree_object(entries, blob_shas).hex()
 
 
 def read_varint(data, offset):
     """Read Git's variable-length integer encoding (MSB format)."""
     byte = data[offset]
-    value = byte & 0x7f
     offset += 1
+    if byte < 0x80:
+        # Single-byte values are by far the most common; skip the loop
+        return byte, offset
     
-    while byte & 0x80:
+    value = byte & 0x7f
+    while True:
         byte = data[offset]
-        value = ((value + 1) << 7) | (byte & 0x7f)
         offset += 1
-    
-    return value, offset
+        value = ((value + 1) << 7) | (byte & 0x7f)
+        if byte < 0x80:
+            return value, offset
 
 
 def read_size_encoding(data, offset):
@@ -152,15 +296,82 @@ def read_size_encoding(data, offset):
     obj_type = (byte >> 4) & 0x07
     size = byte & 0x0f
     offset += 1
-    shift = 4
+    if byte < 0x80:
+        return obj_type, size, offset
     
-    while byte & 0x80:
+    shift = 4
+    while True:
         byte = data[offset]
+        offset += 1
         size |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return obj_type, size, offset
         shift += 7
-        offset += 1
+
+
+def build_copy_handler(instruction):
+    """Compile a straight-line decoder for one delta copy-instruction layout."""
+    # The low seven bits say which offset and size bytes follow; emit
+    # only the reads this layout needs so no bit tests happen per op
+    offset_parts = []
+    size_parts = []
+    pos = 0
+    for bit, shift, parts in (
+        (0x01, 0, offset_parts),
+        (0x02, 8, offset_parts),
+        (0x04, 16, offset_parts),
+        (0x08, 24, offset_parts),
+        (0x10, 0, size_parts),
+        (0x20, 8, size_parts),
+        (0x40, 16, size_parts),
+    ):
+        if instruction & bit:
+            parts.append(f"delta[off + {pos}] << {shift}" if shift else f"delta[off + {pos}]")
+            pos += 1
+    
+    cp_offset = " | ".join(offset_parts) or "0"
+    # A size of zero means 0x10000
+    cp_size = f"({' | '.join(size_parts)}) or 0x10000" if size_parts else "0x10000"
+    
+    source = (
+        "def copy_handler(delta, off):\n"
+        f"    return {cp_offset}, {cp_size}, off + {pos}\n"
+    )
+    namespace = {}
+    exec(source, namespace)
+    return namespace["copy_handler"]
+
+
+# Copy-instruction decoders indexed by the instruction byte; built on
+# first use so commands that never apply a delta skip compiling them
+_copy_handlers = []
+
+
+def get_copy_handlers():
+    """Return the copy-instruction dispatch table, building it if needed."""
+    if not _copy_handlers:
+        _copy_handlers.extend(
+            [None] * 0x80 + [build_copy_handler(i) for i in range(0x80, 0x100)]
+        )
+    return _copy_handlers
+
+
+def read_delta_size(data, offset):
+    """Read a size from a delta header (little-endian base-128)."""
+    byte = data[offset]
+    offset += 1
+    if byte < 0x80:
+        return byte, offset
     
-    return obj_type, size, offset
+    size = byte & 0x7f
+    shift = 7
+    while True:
+        byte = data[offset]
+        offset += 1
+        size |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return size, offset
+        shift += 7
 
 
 def apply_delta(base_data, delta_data):
@@ -168,63 +379,185 @@ def apply_delta(base_data, delta_data):
     offset = 0
     
     # Read base object size
-    base_size, offset = read_varint(delta_data, offset)
+    base_size, offset = read_delta_size(delta_data, offset)
     
     # Read result object size
-    result_size, offset = read_varint(delta_data, offset)
+    result_size, offset = read_delta_size(delta_data, offset)
     
+    # Slice through memoryviews so copy/insert ops don't allocate bytes.
+    # Appending is cheaper than slice-assigning into a preallocated
+    # buffer, since bytearray growth is amortized.
+    base_view = memoryview(base_data)
+    delta_view = memoryview(delta_data)
     result = bytearray()
+    base_len = len(base_data)
+    delta_size = len(delta_data)
+    copy_handlers = get_copy_handlers()
     
-    while offset < len(delta_data):
+    while offset < delta_size:
         instruction = delta_data[offset]
         offset += 1
         
         if instruction & 0x80:  # Copy instruction
-            cp_offset = 0
-            cp_size = 0
-            
-            # Read offset
-            if instruction & 0x01:
-                cp_offset = delta_data[offset]
-                offset += 1
-            if instruction & 0x02:
-                cp_offset |= delta_data[offset] << 8
-                offset += 1
-            if instruction & 0x04:
-                cp_offset |= delta_data[offset] << 16
-                offset += 1
-            if instruction & 0x08:
-                cp_offset |= delta_data[offset] << 24
-                offset += 1
-            
-            # Read size
-            if instruction & 0x10:
-                cp_size = delta_data[offset]
-                offset += 1
-            if instruction & 0x20:
-                cp_size |= delta_data[offset] << 8
-                offset += 1
-            if instruction & 0x40:
-                cp_size |= delta_data[offset] << 16
-                offset += 1
-            
-            if cp_size == 0:
-                cp_size = 0x10000
-            
-            result.extend(base_data[cp_offset:cp_offset + cp_size])
+            cp_offset, cp_size, offset = copy_handlers[instruction](delta_data, offset)
+            # Copies past the base would silently produce a short slice
+            if cp_offset + cp_size > base_len:
+                raise ValueError("Delta copy runs past the end of the base")
+            result += base_view[cp_offset:cp_offset + cp_size]
         else:  # Insert instruction
             if instruction == 0:
                 raise ValueError("Invalid delta instruction")
-            result.extend(delta_data[offset:offset + instruction])
+            if offset + instruction > delta_size:
+                raise ValueError("Delta insert runs past the end of the delta")
+            result += delta_view[offset:offset + instruction]
             offset += instruction
     
-    return bytes(result)
+    if len(result) != result_size:
+        raise ValueError("Delta produced the wrong result size")
+    
+    return result
+
+
+class PackReader:
+    """Sequential reader over packfile data that arrives in chunks."""
+    
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+        self.pos = 0
+        # Pack offset of buffer[0], so object offsets stay absolute
+        self.base = 0
+    
+    @property
+    def offset(self):
+        return self.base + self.pos
+    
+    def fill(self, n):
+        """Buffer at least n unread bytes; False if the pack ends first."""
+        while len(self.buffer) - self.pos < n:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return False
+            self.base += self.pos
+            self.buffer = self.buffer[self.pos:] + chunk
+            self.pos = 0
+        return True
+    
+    def read(self, n):
+        if not self.fill(n):
+            raise ValueError("Truncated packfile")
+        data = self.buffer[self.pos:self.pos + n]
+        self.pos += n
+        return data
+    
+    def read_size_encoding(self):
+        # Object headers are only a few bytes; a short fill can only
+        # happen at the very end of the pack
+        self.fill(16)
+        obj_type, size, self.pos = read_size_encoding(self.buffer, self.pos)
+        return obj_type, size
+    
+    def read_varint(self):
+        self.fill(16)
+        value, self.pos = read_varint(self.buffer, self.pos)
+        return value
+    
+    def inflate(self, size):
+        """Inflate the zlib stream at the current position."""
+        decompressor = zlib.decompressobj()
+        # Feed bounded windows so unused_data never copies much past the
+        # end of the stream. Compressed data is rarely much larger than
+        # the inflated size, so one window usually suffices.
+        window = size + 64
+        chunks = []
+        
+        while not decompressor.eof:
+            if self.pos == len(self.buffer) and not self.fill(1):
+                raise ValueError("Truncated packfile")
+            chunk = memoryview(self.buffer)[self.pos:self.pos + window]
+            chunks.append(decompressor.decompress(chunk))
+            self.pos += len(chunk)
+            window = max(window, 4096)
+        
+        self.pos -= len(decompressor.unused_data)
+        return b"".join(chunks)
+
 
+# Upper bound on inflated objects kept in memory as delta bases
+DELTA_BASE_CACHE_BYTES = 256 * 1024 * 1024
 
-def unpack_object(data, offset, objects_by_offset):
-    """Unpack a single object from the packfile."""
-    start_offset = offset
-    obj_type, size, offset = read_size_encoding(data, offset)
+
+class DeltaBaseCache:
+    """Byte-bounded LRU of inflated (type, content) objects keyed by SHA."""
+    
+    def __init__(self, max_bytes=DELTA_BASE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = collections.OrderedDict()
+    
+    def get(self, sha):
+        entry = self.entries.get(sha)
+        if entry is not None:
+            self.entries.move_to_end(sha)
+        return entry
+    
+    def put(self, sha, obj_type, content):
+        if len(content) > self.max_bytes:
+            return
+        old = self.entries.pop(sha, None)
+        if old is not None:
+            self.size -= len(old[1])
+        self.entries[sha] = (obj_type, content)
+        self.size += len(content)
+        
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class ObjectWriter:
+    """Compress and write loose objects on a thread pool."""
+    
+    def __init__(self, workers=None):
+        workers = workers or available_cpus()
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.pending = collections.deque()
+        # Cap queued writes so inflated objects can't pile up in memory
+        self.max_pending = workers * 4
+    
+    def write(self, sha, header, content):
+        self.pending.append(self.pool.submit(write_object, sha, header, content))
+        while len(self.pending) > self.max_pending:
+            self.pending.popleft().result()
+    
+    def flush(self):
+        """Wait for every queued write, re-raising the first failure."""
+        while self.pending:
+            self.pending.popleft().result()
+    
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.pool.shutdown()
+
+
+def load_delta_base(sha, base_cache, object_writer):
+    """Return a delta base's type and content, inflating from disk on a miss."""
+    entry = base_cache.get(sha)
+    if entry is None:
+        # The base may still be queued for writing
+        object_writer.flush()
+        obj_type, content = read_object(sha)
+        entry = (obj_type.encode(), content)
+        base_cache.put(sha, *entry)
+    return entry
+
+
+def unpack_object(reader, objects_by_offset, base_cache, object_writer):
+    """Unpack the next object from the packfile."""
+    start_offset = reader.offset
+    obj_type, size = reader.read_size_encoding()
     
     # Type constants
     OBJ_COMMIT = 1
@@ -243,132 +576,127 @@ def unpack_object(data, offset, objects_by_offset):
     
     if obj_type == OBJ_OFS_DELTA:
         # Read negative offset
-        neg_offset = data[offset] & 0x7f
-        offset += 1
-        while data[offset - 1] & 0x80:
-            neg_offset = ((neg_offset + 1) << 7) | (data[offset] & 0x7f)
-            offset += 1
+        neg_offset = reader.read_varint()
         
         base_offset = start_offset - neg_offset
-        base_data = objects_by_offset[base_offset]
+        # A delta always has the same type as its base
+        obj_type_name, base_data = load_delta_base(objects_by_offset[base_offset], base_cache, object_writer)
         
         # Decompress delta data
-        decompressor = zlib.decompressobj()
-        delta_data = decompressor.decompress(data[offset:])
+        delta_data = reader.inflate(size)
         
         # Apply delta
         content = apply_delta(base_data, delta_data)
-        offset += len(data[offset:]) - len(decompressor.unused_data)
         
     elif obj_type == OBJ_REF_DELTA:
         # Read base object SHA (20 bytes)
-        base_sha = data[offset:offset + 20]
-        offset += 20
+        base_sha = reader.read(20)
         
         # Find base object
-        base_sha_hex = base_sha.hex()
-        base_path = f".git/objects/{base_sha_hex[:2]}/{base_sha_hex[2:]}"
-        
-        with open(base_path, "rb") as f:
-            compressed = f.read()
-        decompressed = zlib.decompress(compressed)
-        null_idx = decompressed.find(b"\x00")
-        base_data = decompressed[null_idx + 1:]
+        obj_type_name, base_data = load_delta_base(base_sha, base_cache, object_writer)
         
         # Decompress delta data
-        decompressor = zlib.decompressobj()
-        delta_data = decompressor.decompress(data[offset:])
+        delta_data = reader.inflate(size)
         
         # Apply delta
         content = apply_delta(base_data, delta_data)
-        offset += len(data[offset:]) - len(decompressor.unused_data)
         
     else:
         # Regular object
-        decompressor = zlib.decompressobj()
-        content = decompressor.decompress(data[offset:])
-        offset += len(data[offset:]) - len(decompressor.unused_data)
-    
-    # Store object for delta resolution
-    objects_by_offset[start_offset] = content
-    
-    # Write object to disk
-    if obj_type in type_map:
         obj_type_name = type_map[obj_type]
-    else:
-        # For delta objects, we need to determine type from base
-        # For now, we'll determine it when we have the full content
-        # We'll store temporarily and fix later
-        obj_header = b"blob %d\x00" % len(content)
-        obj_data = obj_header + content
-        sha1 = hashlib.sha1(obj_data).hexdigest()
-        
-        # Try to determine actual type from content structure
-        if content.startswith(b"tree ") or (b"\x00" in content[:100] and b" " in content[:10]):
-            obj_type_name = b"tree"
-        elif content.startswith(b"parent ") or content.startswith(b"tree "):
-            obj_type_name = b"commit"
-        else:
-            obj_type_name = b"blob"
+        content = reader.inflate(size)
     
+    # Hash and compress header and content separately so the object is
+    # never concatenated into a second full-size buffer
     obj_header = b"%s %d\x00" % (obj_type_name, len(content))
-    obj_data = obj_header + content
-    sha1 = hashlib.sha1(obj_data).hexdigest()
+    h = hashlib.sha1()
+    h.update(obj_header)
+    h.update(content)
+    sha1 = h.digest()
     
-    object_dir = f".git/objects/{sha1[:2]}"
-    os.makedirs(object_dir, exist_ok=True)
-    object_path = f"{object_dir}/{sha1[2:]}"
+    # Inflating has to stay in pack order, but compressing and writing
+    # each object is independent and zlib releases the GIL
+    object_writer.write(sha1, obj_header, content)
     
-    with open(object_path, "wb") as f:
-        f.write(zlib.compress(obj_data))
+    # Remember the object for delta resolution; only the SHA is kept per
+    # offset so evicted bases can be re-read from disk
+    objects_by_offset[start_offset] = sha1
+    base_cache.put(sha1, obj_type_name, content)
     
-    return offset, sha1
+    return sha1
 
 
-def parse_sideband_data(data):
-    """Parse side-band multiplexed data and extract packfile."""
-    result = bytearray()
-    offset = 0
+def sideband_stream(chunks):
+    """Demultiplex side-band pkt-lines from response chunks, yielding packfile data."""
+    buffer = bytearray()
     
-    while offset < len(data):
-        if offset + 4 > len(data):
-            break
-        
-        # Read pkt-line length
-        length_hex = data[offset:offset + 4]
-        try:
-            length = int(length_hex, 16)
-        except ValueError:
-            break
-        
-        if length == 0:
-            # Flush packet
-            offset += 4
-            continue
-        
-        if length < 4 or offset + length > len(data):
-            break
+    for chunk in chunks:
+        buffer += chunk
+        offset = 0
         
-        # Get packet payload
-        payload = data[offset + 4:offset + length]
+        # The view has to be released before the buffer is resized below
+        with memoryview(buffer) as view:
+            while offset + 4 <= len(buffer):
+                # Read pkt-line length
+                try:
+                    length = int(buffer[offset:offset + 4], 16)
+                except ValueError:
+                    return
+                
+                if length == 0:
+                    # Flush packet
+                    offset += 4
+                    continue
+                
+                if length < 4:
+                    return
+                if offset + length > len(buffer):
+                    # Wait for the rest of this packet
+                    break
+                
+                if length > 4:
+                    band = buffer[offset + 4]
+                    # Copy the payload out exactly once; the buffer is
+                    # reused for the next chunk
+                    packet_data = bytes(view[offset + 5:offset + length])
+                    
+                    if band == 1:
+                        # Band 1: packfile data
+                        yield packet_data
+                    elif band == 2:
+                        # Band 2: progress messages
+                        print(packet_data.decode('utf-8', errors='ignore').strip(), file=sys.stderr)
+                    elif band == 3:
+                        # Band 3: error messages
+                        print("Error from server:", packet_data.decode('utf-8', errors='ignore').strip(), file=sys.stderr)
+                
+                offset += length
         
-        if len(payload) > 0:
-            band = payload[0]
-            packet_data = payload[1:]
-            
-            if band == 1:
-                # Band 1: packfile data
-                result.extend(packet_data)
-            elif band == 2:
-                # Band 2: progress messages
-                print(packet_data.decode('utf-8', errors='ignore').strip(), file=sys.stderr)
-            elif band == 3:
-                # Band 3: error messages
-                print("Error from server:", packet_data.decode('utf-8', errors='ignore').strip(), file=sys.stderr)
-        
-        offset += length
-    
-    return bytes(result)
+        del buffer[:offset]
+
+
+def download_pack(response, pack_queue):
+    """Stream the upload-pack response and queue packfile chunks as they arrive."""
+    try:
+        with response:
+            chunks = iter(lambda: response.read(64 * 1024), b"")
+            for pack_chunk in sideband_stream(chunks):
+                pack_queue.put(pack_chunk)
+        pack_queue.put(None)
+    except Exception as e:
+        # Re-raised on the unpacking side
+        pack_queue.put(e)
+
+
+def queued_chunks(pack_queue):
+    """Yield packfile chunks from the download thread until it finishes."""
+    while True:
+        chunk = pack_queue.get()
+        if chunk is None:
+            return
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield chunk
 
 
 def parse_pkt_line(data):
@@ -380,13 +708,12 @@ def parse_pkt_line(data):
         if offset + 4 > len(data):
             break
             
-        length_hex = data[offset:offset + 4].decode('ascii')
+        length = int(data[offset:offset + 4], 16)
         
-        if length_hex == "0000":
+        if length == 0:
             lines.append(None)  # Flush packet
             offset += 4
         else:
-            length = int(length_hex, 16)
             if length < 4:
                 break
             line_data = data[offset + 4:offset + length]
@@ -467,32 +794,41 @@ def clone_repository(repo_url, directory):
         }
     )
     
-    with urllib.request.urlopen(req) as response:
-        pack_response = response.read()
-    
-    print(f"Received {len(pack_response)} bytes from server", file=sys.stderr)
+    # Unpack while the pack is still downloading: a background thread
+    # reads the response and strips the side-band framing, and objects
+    # are inflated here as soon as their bytes arrive
+    response = urllib.request.urlopen(req)
+    pack_queue = queue.Queue(maxsize=64)
+    downloader = threading.Thread(target=download_pack, args=(response, pack_queue), daemon=True)
+    downloader.start()
     
-    # The response contains side-band multiplexed data
-    # We need to extract the actual packfile from band 1
-    pack_data = parse_sideband_data(pack_response)
-    
-    print(f"Extracted {len(pack_data)} bytes of packfile data", file=sys.stderr)
+    reader = PackReader(queued_chunks(pack_queue))
     
     # Step 3: Unpack packfile
-    if not pack_data.startswith(b"PACK"):
-        print(f"Error: Invalid packfile - starts with: {pack_data[:20]}", file=sys.stderr)
+    reader.fill(12)
+    pack_header = reader.buffer[:12]
+    if len(pack_header) < 12 or not pack_header.startswith(b"PACK"):
+        print(f"Error: Invalid packfile - starts with: {pack_header}", file=sys.stderr)
         return
+    reader.read(12)
     
-    version = struct.unpack(">I", pack_data[4:8])[0]
-    num_objects = struct.unpack(">I", pack_data[8:12])[0]
+    version = struct.unpack(">I", pack_header[4:8])[0]
+    num_objects = struct.unpack(">I", pack_header[8:12])[0]
     
-    print(f"Unpacking {num_objects} objects...", file=sys.stderr)
+    print(f"Unpacking {num_objects} objects with {zlib.__name__}...", file=sys.stderr)
     
-    offset = 12
     objects_by_offset = {}
+    base_cache = DeltaBaseCache()
+    object_writer = ObjectWriter()
+    
+    try:
+        for i in range(num_objects):
+            sha = unpack_object(reader, objects_by_offset, base_cache, object_writer)
+    finally:
+        object_writer.close()
     
-    for i in range(num_objects):
-        offset, sha = unpack_object(pack_data, offset, objects_by_offset)
+    downloader.join()
+    print(f"Unpacked {reader.offset} bytes of packfile data", file=sys.stderr)
     
     # Step 4: Update HEAD and refs
     with open(".git/HEAD", "w") as f:
@@ -534,16 +870,7 @@ def main():
             with open(file_path, "rb") as f:
                 content = f.read()
 
-            blob_object = b"blob %d\x00%s" % (len(content), content)
-            sha1 = hashlib.sha1(blob_object).hexdigest()
-
-            object_dir = f".git/objects/{sha1[:2]}"
-            os.makedirs(object_dir, exist_ok=True)
-            object_path = f"{object_dir}/{sha1[2:]}"
-            with open(object_path, "wb") as f:
-                f.write(zlib.compress(blob_object))
-
-            print(sha1)
+            print(store_blob(content).hex())
     elif command == "ls-tree":
         if sys.argv[2] == "--name-only":
             tree_sha = sys.argv[3]
@@ -555,13 +882,8 @@ def main():
             content_start_index = decompressed_contents.find(b"\x00") + 1
             entries_data = decompressed_contents[content_start_index:]
 
-            i = 0
-            while i < len(entries_data):
-                space_index = entries_data.find(b" ", i)
-                null_index = entries_data.find(b"\x00", space_index)
-                name = entries_data[space_index + 1 : null_index]
+            for _, name, _ in parse_tree(entries_data):
                 print(name.decode())
-                i = null_index + 21
     elif command == "write-tree":
         sha = write_tree()
         print(sha)
@@ -596,16 +918,15 @@ def main():
         lines.append(message)
 
         content = "\n".join(lines) + "\n"
-        commit_object = b"commit %d\x00%s" % (len(content), content.encode("utf-8"))
-        hex_sha = hashlib.sha1(commit_object).hexdigest()
-
-        object_dir = f".git/objects/{hex_sha[:2]}"
-        os.makedirs(object_dir, exist_ok=True)
-        object_path = f"{object_dir}/{hex_sha[2:]}"
-        with open(object_path, "wb") as f:
-            f.write(zlib.compress(commit_object))
-
-        print(hex_sha)
+        body = content.encode("utf-8")
+        header = b"commit %d\x00" % len(body)
+        h = hashlib.sha1()
+        h.update(header)
+        h.update(body)
+        sha = h.digest()
+        write_object(sha, header, body)
+
+        print(sha.hex())
     elif command == "clone":
         repo_url = sys.argv[2]
         directory = sys.argv[3] if len(sys.argv) > 3 else repo_url.split('/')[-1].replace('.git', '')